@@ -4,27 +4,20 @@ This module provides the entry point for the 'agent-overlay' tool,
 mapping CLI commands to the underlying OverlayManager logic.
 """
 
-import argparse
 import sys
 import os
-from .core import OverlayManager
+from types import SimpleNamespace
 
-def main():
-    """Entry point for the agent-overlay CLI.
-    
-    Parses arguments and executes the corresponding OverlayManager methods.
-    Exits with code 1 on error.
-    """
-    parser = argparse.ArgumentParser(
-        description="""
+
+_DESC = """
 AI Agent Workspace Overlay Manager.
 
 This tool creates isolated, writable workspace views using Copy-on-Write (COW) FUSE overlays. 
 It allows multiple AI agents (or humans) to work concurrently on the same codebase without 
 interfering with each other or the base repository.
-""",
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog="""
+"""
+
+_EPILOG = """
 Example Workflow:
   1. Start a new task isolation:
      $ agent-overlay start my-bug-fix --base /path/to/repo
@@ -44,68 +37,185 @@ Example Workflow:
   6. Apply changes to your main branch (via git) and cleanup:
      $ agent-overlay abort my-bug-fix
 """
-    )
-    subparsers = parser.add_subparsers(dest="command", help="Commands")
 
-    # Start command
+
+# Success banner for 'start', written with a single call.
+_START_MESSAGE = (
+    "✅ Task '{name}' started.\n"
+    "📂 Mount point: {merged}\n"
+    "💡 Hint: {hint}\n"
+)
+
+
+def _cmd_start(args, manager):
+    """Handles 'agent-overlay start'."""
+    merged_path = manager.start_task(args.name)
+    sys.stdout.write(_START_MESSAGE.format(
+        name=args.name, merged=merged_path, hint=manager.get_bazel_hint(args.name)))
+
+    if not args.no_shell:
+        manager.enter_shell(args.name)
+
+
+def _cmd_abort(args, manager):
+    """Handles 'agent-overlay abort'."""
+    manager.abort_task(args.name)
+    print(f"🛑 Task '{args.name}' aborted and cleaned up.")
+
+
+_STATUS_LETTERS = {"added": "A", "modified": "M", "deleted": "D"}
+
+
+def _cmd_diff(args, manager):
+    """Handles 'agent-overlay diff'."""
+    if getattr(args, "summary", False):
+        for status, rel in manager.list_changes(args.name):
+            print(f"{_STATUS_LETTERS[status]} {rel}")
+    elif manager.diff_task_stream(args.name) >= 2:
+        # diff already reported the problem on stderr.
+        sys.exit(2)
+
+
+def _cmd_shell(args, manager):
+    """Handles 'agent-overlay shell'."""
+    manager.enter_shell(args.name)
+
+
+def _cmd_list(args, manager):
+    """Handles 'agent-overlay list'."""
+    tasks = manager.list_tasks()
+    if not tasks:
+        print("No active tasks.")
+    else:
+        print("Active Tasks:")
+        for t in tasks:
+            print(f" - {t}")
+
+
+# Subcommands that take no flags, mapped to (handler, number of positionals).
+# Invocations matching these exactly are dispatched without argparse.
+_FAST_COMMANDS = {
+    "list": (_cmd_list, 0),
+    "abort": (_cmd_abort, 1),
+    "diff": (_cmd_diff, 1),
+    "shell": (_cmd_shell, 1),
+}
+
+
+def _parse_fast(argv):
+    """Matches trivial invocations such as 'list' or 'abort NAME'.
+
+    Args:
+        argv: The command-line arguments, excluding the program name.
+
+    Returns:
+        A (handler, args) tuple, or None if argparse is needed.
+    """
+    if not argv or argv[0] not in _FAST_COMMANDS:
+        return None
+    func, nargs = _FAST_COMMANDS[argv[0]]
+    rest = argv[1:]
+    if len(rest) != nargs or any(a.startswith("-") for a in rest):
+        return None
+    return func, SimpleNamespace(command=argv[0], name=rest[0] if rest else None)
+
+
+def _add_start(subparsers):
+    """Registers the 'start' subcommand."""
     start_p = subparsers.add_parser("start", help="Start a new task overlay")
     start_p.add_argument("name", help="Task name")
     start_p.add_argument("--base", default=".", help="Base directory (default: current)")
     start_p.add_argument("--no-shell", action="store_true", help="Do not enter the shell automatically")
+    start_p.set_defaults(func=_cmd_start)
 
-    # Abort command
+
+def _add_abort(subparsers):
+    """Registers the 'abort' subcommand."""
     abort_p = subparsers.add_parser("abort", help="Abort and cleanup a task overlay")
     abort_p.add_argument("name", help="Task name")
+    abort_p.set_defaults(func=_cmd_abort)
+
 
-    # Diff command
+def _add_diff(subparsers):
+    """Registers the 'diff' subcommand."""
     diff_p = subparsers.add_parser("diff", help="Show changes made in the task overlay")
     diff_p.add_argument("name", help="Task name")
+    diff_p.add_argument("--summary", action="store_true", help="Only list changed files (A/M/D)")
+    diff_p.set_defaults(func=_cmd_diff)
 
-    # List command
+
+def _add_list(subparsers):
+    """Registers the 'list' subcommand."""
     list_p = subparsers.add_parser("list", help="List active task overlays")
+    list_p.set_defaults(func=_cmd_list)
+
 
-    # Shell command
+def _add_shell(subparsers):
+    """Registers the 'shell' subcommand."""
     shell_p = subparsers.add_parser("shell", help="Enter an isolated shell for a task")
     shell_p.add_argument("name", help="Task name")
+    shell_p.set_defaults(func=_cmd_shell)
+
+
+# Subparser builders, in the order they are listed in '--help'.
+_SUBCOMMANDS = {
+    "start": _add_start,
+    "abort": _add_abort,
+    "diff": _add_diff,
+    "list": _add_list,
+    "shell": _add_shell,
+}
+
+
+def _parse_args():
+    """Builds the argparse parser and parses sys.argv.
+
+    Only the subparser for the requested command is built; the full set is
+    built when no known command is given, so the top-level help lists them all.
+
+    Returns:
+        A (handler, args) tuple; the handler is None if no command was given.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description=_DESC,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=_EPILOG,
+    )
+    subparsers = parser.add_subparsers(dest="command", help="Commands")
+
+    argv = sys.argv[1:]
+    wanted = [argv[0]] if argv and argv[0] in _SUBCOMMANDS else list(_SUBCOMMANDS)
+    for name in wanted:
+        _SUBCOMMANDS[name](subparsers)
 
     args = parser.parse_args()
+    func = getattr(args, "func", None)
+    if func is None:
+        parser.print_help()
+    return func, args
+
+
+def main():
+    """Entry point for the agent-overlay CLI.
+    
+    Parses arguments and executes the corresponding OverlayManager methods.
+    Exits with code 1 on error.
+    """
+    func, args = _parse_fast(sys.argv[1:]) or _parse_args()
+    if func is None:
+        return
+
+    # Imported here so that '--help' and usage errors skip the core module.
+    from .core import OverlayManager
 
     # Use a project-specific base if we can detect it, otherwise use current dir
     base = os.path.abspath(args.base if hasattr(args, 'base') else '.')
-    manager = OverlayManager(base_dir=base)
 
     try:
-        if args.command == "start":
-            merged_path = manager.start_task(args.name)
-            print(f"✅ Task '{args.name}' started.")
-            print(f"📂 Mount point: {merged_path}")
-            print(f"💡 Hint: {manager.get_bazel_hint(args.name)}")
-            
-            if not args.no_shell:
-                manager.enter_shell(args.name)
-        
-        elif args.command == "abort":
-            manager.abort_task(args.name)
-            print(f"🛑 Task '{args.name}' aborted and cleaned up.")
-        
-        elif args.command == "diff":
-            diff_output = manager.diff_task(args.name)
-            print(diff_output)
-        
-        elif args.command == "shell":
-            manager.enter_shell(args.name)
-        
-        elif args.command == "list":
-            tasks = manager.list_tasks()
-            if not tasks:
-                print("No active tasks.")
-            else:
-                print("Active Tasks:")
-                for t in tasks:
-                    print(f" - {t}")
-        else:
-            parser.print_help()
-    
+        manager = OverlayManager(base_dir=base)
+        func(args, manager)
     except Exception as e:
         print(f"❌ Error: {e}", file=sys.stderr)
         sys.exit(1)
@@ -0,0 +1,34 @@
+"""Unit tests for the agent-overlay command-line interface.
+
+These tests verify that trivial invocations are dispatched without argparse
+and that anything else falls through to the full parser.
+"""
+
+import pytest
+from overlay_manager import cli
+
+@pytest.mark.parametrize("argv, func, name", [
+    (["list"], cli._cmd_list, None),
+    (["abort", "my-fix"], cli._cmd_abort, "my-fix"),
+    (["diff", "my-fix"], cli._cmd_diff, "my-fix"),
+    (["shell", "my-fix"], cli._cmd_shell, "my-fix"),
+])
+def test_parse_fast_matches_trivial_commands(argv, func, name):
+    """Tests that flag-free commands take the fast path."""
+    matched, args = cli._parse_fast(argv)
+    assert matched is func
+    assert args.command == argv[0]
+    assert args.name == name
+
+@pytest.mark.parametrize("argv", [
+    [],
+    ["diff", "my-fix", "--summary"],
+    ["abort", "-h"],
+    ["list", "extra"],
+    ["abort"],
+    ["start", "my-fix"],
+    ["--help"],
+])
+def test_parse_fast_falls_through(argv):
+    """Tests that flags, wrong arity and other commands are left to argparse."""
+    assert cli._parse_fast(argv) is None
@@ -7,7 +7,11 @@ isolation, modification tracking (diff), and cleanup.
 import os
 import pytest
 import shutil
-from overlay_manager.core import OverlayManager
+from overlay_manager.core import (
+    OverlayManager,
+    _enumerate_changes,
+    _iter_upper_changes,
+)
 
 @pytest.fixture
 def base_dir(tmp_path):
@@ -72,7 +76,145 @@ def test_abort_nonexistent_task(manager):
     with pytest.raises(ValueError, match="not found"):
         manager.abort_task("ghost")
 
+@pytest.mark.parametrize("count", [3, 6])
+def test_list_tasks_skips_unmounted(manager, tasks_root, count):
+    """Tests that stale task directories are not listed, with and without the thread pool."""
+    for i in range(count):
+        os.makedirs(os.path.join(tasks_root, f"stale{i}", "merged"))
+    os.makedirs(os.path.join(tasks_root, "half_cleaned"))
+    assert manager.list_tasks() == []
+
+def test_abort_stale_task(manager, tasks_root):
+    """Tests that aborting an unmounted, half-cleaned task removes it."""
+    os.makedirs(os.path.join(tasks_root, "stale", "merged"))
+    manager.abort_task("stale")
+    assert not os.path.exists(os.path.join(tasks_root, "stale"))
+
+def test_abort_tasks(manager, tasks_root):
+    """Tests that batch abort removes every listed task directory."""
+    names = [f"batch{i}" for i in range(3)]
+    for name in names:
+        os.makedirs(os.path.join(tasks_root, name, "merged"))
+    assert manager.abort_tasks(names)
+    assert os.listdir(tasks_root) == []
+
+def test_abort_tasks_nonexistent_task(manager, tasks_root):
+    """Tests that batch abort validates every name before removing anything."""
+    os.makedirs(os.path.join(tasks_root, "real"))
+    with pytest.raises(ValueError, match="not found"):
+        manager.abort_tasks(["real", "ghost"])
+    assert os.path.exists(os.path.join(tasks_root, "real"))
+
 def test_enter_shell_nonexistent_task(manager):
     """Tests that entering a shell for a non-existent task raises a ValueError."""
     with pytest.raises(ValueError, match="not found"):
         manager.enter_shell("ghost")
+
+def test_iter_upper_changes(tmp_path):
+    """Tests that upper-layer enumeration reports files, whiteouts and opaque dirs."""
+    upper = tmp_path / "upper"
+    (upper / "src").mkdir(parents=True)
+    (upper / "src" / "main.py").write_text("print('hi')")
+    (upper / "src" / ".wh.old.py").write_text("")
+    (upper / "build").mkdir()
+    (upper / "build" / ".wh..wh..opq").write_text("")
+
+    changes = list(_iter_upper_changes(str(upper)))
+    assert changes == [
+        ("build", "opaque"),
+        (os.path.join("src", "old.py"), "whiteout"),
+        (os.path.join("src", "main.py"), "file"),
+    ]
+
+def test_enumerate_changes(tmp_path):
+    """Tests that upper-layer entries are classified against the base."""
+    base = tmp_path / "base"
+    (base / "src").mkdir(parents=True)
+    (base / "src" / "main.py").write_text("print('hello')")
+    (base / "src" / "old.py").write_text("")
+    (base / "build" / "out").mkdir(parents=True)
+    (base / "build" / "out" / "a.o").write_text("")
+    (base / "build" / "keep.txt").write_text("")
+    (base / "notes").write_text("was a file")
+
+    upper = tmp_path / "upper"
+    (upper / "src").mkdir(parents=True)
+    (upper / "src" / "main.py").write_text("print('hi')")
+    (upper / "src" / "new.py").write_text("")
+    (upper / "src" / ".wh.old.py").write_text("")
+    (upper / "build").mkdir()
+    (upper / "build" / ".wh..wh..opq").write_text("")
+    (upper / "build" / "keep.txt").write_text("rebuilt")
+    (upper / "notes").mkdir()
+    (upper / "notes" / "todo.txt").write_text("")
+
+    changes = sorted(_enumerate_changes(str(upper), str(base)))
+    assert changes == [
+        ("added", os.path.join("notes", "todo.txt")),
+        ("added", os.path.join("src", "new.py")),
+        ("deleted", os.path.join("build", "out", "a.o")),
+        ("deleted", os.path.join("src", "old.py")),
+        ("modified", os.path.join("build", "keep.txt")),
+        ("modified", os.path.join("src", "main.py")),
+        ("opaque_dir", "build"),
+    ]
+
+def test_list_changes(manager, base_dir, tasks_root):
+    """Tests that list_changes summarizes the upper layer without a mount."""
+    upper = os.path.join(tasks_root, "summary_task", "upper")
+    os.makedirs(upper)
+    with open(os.path.join(upper, "file.txt"), "w") as f:
+        f.write("changed")
+    with open(os.path.join(upper, "added.txt"), "w") as f:
+        f.write("new")
+
+    assert manager.list_changes("summary_task") == [
+        ("added", "added.txt"),
+        ("modified", "file.txt"),
+    ]
+    with pytest.raises(ValueError, match="not found"):
+        manager.list_changes("ghost")
+
+
+def test_changes_without_upper(manager, tasks_root):
+    """Tests that a half-cleaned task with no upper layer reports no changes."""
+    os.makedirs(os.path.join(tasks_root, "half_cleaned"))
+    assert manager.list_changes("half_cleaned") == []
+    assert manager.diff_task("half_cleaned") == ""
+
+def test_diff_without_mount(manager, base_dir, tasks_root, tmp_path):
+    """Tests diff_task and diff_task_stream against a fake upper/merged pair."""
+    root = os.path.join(tasks_root, "diff_task")
+    os.makedirs(os.path.join(root, "upper"))
+    shutil.copytree(base_dir, os.path.join(root, "merged"))
+    assert manager.diff_task("diff_task") == ""
+
+    for layer in ("upper", "merged"):
+        with open(os.path.join(root, layer, "file.txt"), "w") as f:
+            f.write("hello overlay")
+
+    diff = manager.diff_task("diff_task")
+    assert "-hello world" in diff
+    assert "+hello overlay" in diff
+
+    out_path = tmp_path / "diff.out"
+    with open(out_path, "w") as out:
+        assert manager.diff_task_stream("diff_task", out) == 1
+    assert out_path.read_text() == diff
+
+def test_diff_special_files(manager, base_dir, tasks_root, tmp_path):
+    """Tests that a fifo in the task is reported instead of blocking diff."""
+    root = os.path.join(tasks_root, "fifo_task")
+    os.makedirs(os.path.join(root, "upper"))
+    shutil.copytree(base_dir, os.path.join(root, "merged"))
+    for layer in ("upper", "merged"):
+        os.mkfifo(os.path.join(root, layer, "pipe"))
+
+    merged = os.path.join(root, "merged")
+    expected = f"Only in {merged}: pipe\n"
+    assert manager.diff_task("fifo_task") == expected
+
+    out_path = tmp_path / "diff.out"
+    with open(out_path, "w") as out:
+        assert manager.diff_task_stream("fifo_task", out) == 1
+    assert out_path.read_text() == expected